@@ -1,29 +1,39 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import shutil
+import subprocess
 import base64
+import hashlib
 import zipfile
 import json
+import random
+import re
 import time
-from collections import defaultdict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache, partial
 from io import BytesIO
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 from typing import Any
 
 import requests
 import streamlit as st
-from PIL import Image, ImageEnhance, ImageOps
+from requests.adapters import HTTPAdapter
+from PIL import Image, ImageEnhance, ImageOps, ImageStat
 
-from capture import CaptureConfig, capture_urls, read_urls
+from capture import read_urls
 from storage import (
     RefRow,
+    claim_pending,
     db_conn,
     export_csv,
     init_db,
     list_failed,
-    list_pending,
     list_references,
     mark_processing,
     reset_to_pending,
@@ -31,8 +41,9 @@ from storage import (
     stats,
     update_edited_rows,
     enqueue_urls,
-    apply_capture_result,
+    write_transaction,
 )
+from worker import capture_groups
 
 try:
     from reportlab.lib.pagesizes import A4
@@ -52,43 +63,154 @@ DEFAULT_DB_PATH = DATA_ROOT / "data" / "references.db"
 DEFAULT_EXPORT_CSV = DATA_ROOT / "index.csv"
 MAX_FACE_UPLOAD_MB = 15
 MAX_STORY_PAGES = 6
-STORYBOOK_TEMPLATES: dict[str, list[str]] = {
-    "별빛 모험": [
+STORYBOOK_HISTORY_SIZE = 8
+MAX_CAPTURE_WORKERS = 2
+AI_REQUEST_ATTEMPTS = 4
+AI_RETRY_MAX_DELAY = 8.0
+PNG_OPTIMIZE = os.environ.get("APC_PNG_OPTIMIZE", "").strip() == "1"
+PREVIEW_IMAGE_WIDTH = 360
+EDITOR_COLUMNS = (
+    "id",
+    "brand",
+    "season",
+    "item",
+    "source_url",
+    "image_path",
+    "captured_at",
+    "SILHOUETTE",
+    "COLOR",
+    "DETAIL",
+    "MATERIAL",
+    "MOOD",
+    "FUNCTION",
+    "USE_CASE",
+    "fit_key",
+    "apc_fit_score",
+    "notes",
+    "status",
+    "error_message",
+    "updated_at",
+)
+# Already slug-shaped, so selectbox values skip _slug.
+ITEM_CHOICES = ("tee", "pants", "outer", "knit", "other")
+# Deterministic per-page transforms: angle/zoom/color/light changes.
+PAGE_VARIANT_PRESETS = (
+    {"angle": -8, "zoom": 1.10, "sat": 1.15, "con": 1.05, "bri": 1.00},
+    {"angle": 7, "zoom": 1.05, "sat": 1.00, "con": 1.10, "bri": 1.05},
+    {"angle": -4, "zoom": 1.18, "sat": 1.20, "con": 1.00, "bri": 0.98},
+    {"angle": 11, "zoom": 1.08, "sat": 0.95, "con": 1.08, "bri": 1.08},
+    {"angle": -12, "zoom": 1.12, "sat": 1.10, "con": 0.98, "bri": 1.02},
+    {"angle": 3, "zoom": 1.00, "sat": 1.05, "con": 1.03, "bri": 1.00},
+)
+PRECOMPRESSED_SUFFIXES = frozenset({".png", ".jpg", ".jpeg", ".webp", ".pdf", ".zip"})
+STORYBOOK_TEMPLATES: dict[str, tuple[str, ...]] = {
+    "별빛 모험": (
         "오늘 밤, {child}는 반짝이는 별지도를 따라 숲으로 떠났어요.",
         "{child}의 미소를 본 반딧불이들이 길을 밝혀 주었어요.",
         "달빛 호수에서 만난 부엉이 선생님이 용기의 주문을 알려 주었어요.",
         "{child}는 별조각 퍼즐을 맞춰 잃어버린 길을 되찾았어요.",
         "새벽이 오기 전, {child}는 친구들과 별다리를 건넜어요.",
         "집에 돌아온 {child}는 내일 또 새로운 모험을 꿈꿨어요.",
-    ],
-    "바다 친구": [
+    ),
+    "바다 친구": (
         "{child}는 파도 소리를 따라 푸른 바다 마을에 도착했어요.",
         "작은 해마 친구가 {child}에게 산호 지도를 건네주었어요.",
         "바닷속 동굴에서 길을 잃은 거북이를 함께 찾아 나섰어요.",
         "{child}는 반짝이는 조개로 길표시를 만들어 친구들을 이끌었어요.",
         "커다란 고래가 등장해 모두를 안전한 항구로 데려다주었어요.",
         "{child}는 바다 친구들과 약속했어요. 다시 만나 모험하기로요.",
-    ],
-    "공룡 탐험": [
+    ),
+    "공룡 탐험": (
         "{child}는 시간문을 지나 공룡 섬에 도착했어요.",
         "초식공룡 친구가 {child}에게 숲길 안내를 부탁했어요.",
         "화산이 흔들리자 {child}는 모두를 넓은 평원으로 이끌었어요.",
         "작은 티라노가 겁을 먹자 {child}가 손을 잡아 주었어요.",
         "위험이 지나가고 공룡들은 {child}를 용감한 대장으로 불렀어요.",
         "집으로 돌아온 {child}는 탐험 일기에 오늘의 용기를 적었어요.",
-    ],
+    ),
+}
+DEFAULT_STORYBOOK_TEMPLATE = "별빛 모험"
+# Each page pre-split on "{child}" so filling in the name is a plain str.join.
+_STORYBOOK_SPLIT: dict[str, tuple[tuple[str, ...], ...]] = {
+    name: tuple(tuple(page.split("{child}")) for page in pages) for name, pages in STORYBOOK_TEMPLATES.items()
 }
+STORYBOOK_PAGE_MD = "## {i}페이지\n![{child} 페이지 이미지]({image})\n\n{body}\n\n"
+# Python's \w is exactly str.isalnum() plus "_", so this matches every non-alnum char.
+_SLUG_RE = re.compile(r"[\W_]")
+
+
+@st.cache_resource(show_spinner=False)
+def _init_db_once(path_str: str) -> bool:
+    conn = db_conn(Path(path_str))
+    try:
+        init_db(conn)
+    finally:
+        conn.close()
+    return True
 
 
 def get_conn(path: Path):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    conn = db_conn(path)
-    init_db(conn)
+    # One connection per browser session, reused across reruns. A connection carries its own
+    # transaction state, so sharing one between concurrent sessions is not safe.
+    key = f"_db_conn:{path}"
+    conn = st.session_state.get(key)
+    if conn is None:
+        _init_db_once(str(path))
+        conn = db_conn(path)
+        st.session_state[key] = conn
     return conn
 
 
+def _db_version(path: Path) -> tuple[int, int]:
+    # WAL mode appends to the -wal file, so the main file's mtime alone lags behind writes.
+    versions = []
+    for p in (path, path.with_name(path.name + "-wal")):
+        try:
+            versions.append(p.stat().st_mtime_ns)
+        except OSError:
+            versions.append(0)
+    return versions[0], versions[1]
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _cached_stats(db_path_str: str, db_version: tuple[int, int]) -> dict[str, int]:
+    return stats(get_conn(Path(db_path_str)))
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _cached_list_references(
+    db_path_str: str,
+    db_version: tuple[int, int],
+    brand: str,
+    season: str,
+    item: str,
+    status: str,
+    limit: int,
+):
+    return list_references(
+        get_conn(Path(db_path_str)),
+        brand=brand,
+        season=season,
+        item=item,
+        status=status,
+        limit=limit,
+        columns=EDITOR_COLUMNS,
+    )
+
+
+def invalidate_query_cache() -> None:
+    _cached_stats.clear()
+    _cached_list_references.clear()
+
+
+@lru_cache(maxsize=32)
+def _resolve_path(raw: str) -> Path:
+    return Path(raw).expanduser().resolve()
+
+
+@lru_cache(maxsize=256)
 def _slug(v: str) -> str:
-    return "".join(c.lower() if c.isalnum() else "-" for c in v.strip()).strip("-") or "unknown"
+    return _SLUG_RE.sub("-", v.strip()).lower().strip("-") or "unknown"
 
 
 def save_uploaded_files(files: list[Any], target_dir: Path) -> list[str]:
@@ -97,8 +219,13 @@ def save_uploaded_files(files: list[Any], target_dir: Path) -> list[str]:
     for f in files:
         out = target_dir / os.path.basename(f.name)
         with out.open("wb") as w:
-            w.write(f.read())
-        saved.append(str(out.resolve()))
+            if hasattr(f, "getbuffer"):
+                # Streamlit uploads are in-memory BytesIO: write the buffer as-is, no intermediate copies.
+                w.write(f.getbuffer())
+            else:
+                f.seek(0)
+                shutil.copyfileobj(f, w, length=1024 * 1024)
+        saved.append(str(out))
     return saved
 
 
@@ -106,72 +233,160 @@ def _safe_slug(v: str) -> str:
     return _slug(v or "child")
 
 
-def build_story_pages(child_name: str, template_name: str, custom_story: str) -> list[str]:
+@lru_cache(maxsize=128)
+def build_story_pages(child_name: str, template_name: str, custom_story: str) -> tuple[str, ...]:
     custom_lines = [line.strip() for line in (custom_story or "").splitlines() if line.strip()]
-    template_pages = STORYBOOK_TEMPLATES.get(template_name, STORYBOOK_TEMPLATES["별빛 모험"])
-    if custom_lines:
-        pages = custom_lines[:MAX_STORY_PAGES]
-        if len(pages) < MAX_STORY_PAGES:
-            pages.extend(p.format(child=child_name) for p in template_pages[len(pages):MAX_STORY_PAGES])
-        return pages
-    return [p.format(child=child_name) for p in template_pages[:MAX_STORY_PAGES]]
+    template_pages = _STORYBOOK_SPLIT.get(template_name) or _STORYBOOK_SPLIT[DEFAULT_STORYBOOK_TEMPLATE]
+    pages = custom_lines[:MAX_STORY_PAGES]
+    pages.extend(child_name.join(parts) for parts in template_pages[len(pages):MAX_STORY_PAGES])
+    return tuple(pages)
+
+
+def optimize_png(path: Path) -> None:
+    if not PNG_OPTIMIZE:
+        return
+    oxipng = shutil.which("oxipng")
+    if not oxipng:
+        return
+    subprocess.run([oxipng, "-o", "2", "--strip", "safe", "-q", str(path)], check=False)
 
 
 def normalize_face_image(face_upload: Any, out_dir: Path) -> Path:
-    raw = face_upload.getvalue()
-    if not raw:
+    # Decode straight from the upload buffer instead of copying it out with getvalue().
+    if not face_upload.getbuffer().nbytes:
         raise ValueError("업로드된 이미지가 비어 있습니다.")
+    face_upload.seek(0)
     try:
-        with Image.open(BytesIO(raw)) as img:
+        with Image.open(face_upload) as img:
+            # Let JPEGs decode at reduced scale, but only down to 2x the target (the bound thumbnail()'s
+            # default reducing_gap uses) so LANCZOS still has detail to work with. The square bound
+            # keeps this safe before EXIF rotation.
+            img.draft("RGB", (3200, 3200))
+            # Convert before resizing: thumbnail() falls back to NEAREST for palette/1-bit images.
             img = ImageOps.exif_transpose(img).convert("RGB")
             # Normalize size for faster downstream generation and predictable output.
             img.thumbnail((1600, 1600), Image.Resampling.LANCZOS)
             out = out_dir / "face.png"
             img.save(out, format="PNG", optimize=True)
+            optimize_png(out)
             return out
     except Exception as e:  # noqa: BLE001
         raise ValueError(f"지원하지 않는 이미지이거나 손상된 파일입니다: {e}") from e
 
 
+def _enhance_color_contrast_brightness(img: Image.Image, sat: float, con: float, bri: float) -> Image.Image:
+    img = ImageEnhance.Color(img).enhance(sat)
+    # Contrast then brightness is one affine map per channel value, so apply both as a single LUT pass.
+    mean = int(ImageStat.Stat(img.convert("L")).mean[0] + 0.5)
+    lut = [min(255, max(0, int((mean + (v - mean) * con) * bri + 0.5))) for v in range(256)]
+    return img.point(lut * len(img.getbands()))
+
+
 def create_page_variant_images(face_path: Path, out_dir: Path, page_count: int, keep_existing: bool = False) -> list[Path]:
+    # face.png is already EXIF-transposed RGB from normalize_face_image.
     with Image.open(face_path) as base_img:
-        base = ImageOps.exif_transpose(base_img).convert("RGB")
+        base = base_img.convert("RGB")
     variants: list[Path] = []
-    # Deterministic per-page transforms: angle/zoom/color/light changes.
-    presets = [
-        {"angle": -8, "zoom": 1.10, "sat": 1.15, "con": 1.05, "bri": 1.00},
-        {"angle": 7, "zoom": 1.05, "sat": 1.00, "con": 1.10, "bri": 1.05},
-        {"angle": -4, "zoom": 1.18, "sat": 1.20, "con": 1.00, "bri": 0.98},
-        {"angle": 11, "zoom": 1.08, "sat": 0.95, "con": 1.08, "bri": 1.08},
-        {"angle": -12, "zoom": 1.12, "sat": 1.10, "con": 0.98, "bri": 1.02},
-        {"angle": 3, "zoom": 1.00, "sat": 1.05, "con": 1.03, "bri": 1.00},
-    ]
+    presets = PAGE_VARIANT_PRESETS
+    bicubic = Image.Resampling.BICUBIC
+    lanczos = Image.Resampling.LANCZOS
+    geo_cache: dict[tuple[int, float], Image.Image] = {}
     for i in range(page_count):
         out = out_dir / f"page_{i + 1:02d}.png"
         if keep_existing and out.exists():
             variants.append(out)
             continue
         p = presets[i % len(presets)]
-        img = base.copy()
-        img = img.rotate(p["angle"], expand=True, resample=Image.Resampling.BICUBIC, fillcolor=(20, 20, 20))
-
-        w, h = img.size
-        crop_w = int(w / p["zoom"])
-        crop_h = int(h / p["zoom"])
-        left = (w - crop_w) // 2
-        top = (h - crop_h) // 2
-        img = img.crop((left, top, left + crop_w, top + crop_h))
-
-        img = ImageEnhance.Color(img).enhance(p["sat"])
-        img = ImageEnhance.Contrast(img).enhance(p["con"])
-        img = ImageEnhance.Brightness(img).enhance(p["bri"])
-        img = img.resize((1024, 1024), Image.Resampling.LANCZOS)
-
-        img.save(out, format="PNG")
+        geo_key = (p["angle"], p["zoom"])
+        img = geo_cache.get(geo_key)
+        if img is None:
+            img = base.rotate(p["angle"], expand=True, resample=bicubic, fillcolor=(20, 20, 20))
+
+            w, h = img.size
+            crop_w = int(w / p["zoom"])
+            crop_h = int(h / p["zoom"])
+            left = (w - crop_w) // 2
+            top = (h - crop_h) // 2
+            img = img.crop((left, top, left + crop_w, top + crop_h))
+            geo_cache[geo_key] = img
+
+        img = _enhance_color_contrast_brightness(img, p["sat"], p["con"], p["bri"])
+        img = img.resize((1024, 1024), lanczos)
+
+        # Fast zlib level; optimize_png recompresses when size matters (APC_PNG_OPTIMIZE=1).
+        img.save(out, format="PNG", compress_level=1)
+        optimize_png(out)
         variants.append(out)
     return variants
 
 
+def _retry_delay(resp: requests.Response | None, retry: int) -> float:
+    # Honour Retry-After when given; otherwise truncated exponential backoff with jitter.
+    retry_after = resp.headers.get("Retry-After") if resp is not None else None
+    if retry_after:
+        try:
+            return min(AI_RETRY_MAX_DELAY, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return min(AI_RETRY_MAX_DELAY, 0.5 * (2**retry)) + random.uniform(0, 0.25)
+
+
+def _generate_ai_page(
+    session: requests.Session,
+    endpoint: str,
+    headers: dict[str, str],
+    face_name: str,
+    face_bytes: bytes,
+    prompt: str,
+    out: Path,
+    i: int,
+) -> tuple[Path | None, str | None]:
+    data = {
+        "model": "gpt-image-1",
+        "prompt": prompt,
+        "size": "1024x1024",
+    }
+    try:
+        resp = None
+        for retry in range(AI_REQUEST_ATTEMPTS):
+            files = {
+                "image": (face_name, BytesIO(face_bytes), "application/octet-stream"),
+            }
+            try:
+                resp = session.post(endpoint, headers=headers, files=files, data=data, timeout=120)
+            except (requests.ConnectionError, requests.Timeout):
+                if retry == AI_REQUEST_ATTEMPTS - 1:
+                    raise
+                resp = None
+            if resp is not None and resp.status_code < 500 and resp.status_code != 429:
+                break
+            if retry < AI_REQUEST_ATTEMPTS - 1:
+                time.sleep(_retry_delay(resp, retry))
+        if resp is None:
+            return None, f"AI 이미지 {i}페이지 생성 실패: 응답 없음"
+        if resp.status_code >= 400:
+            detail = (resp.text or "").strip().replace("\n", " ")[:140]
+            return None, f"AI 이미지 {i}페이지 생성 실패: {resp.status_code} {detail}"
+        payload = resp.json()
+        items = payload.get("data", [])
+        if not items:
+            return None, f"AI 이미지 {i}페이지 응답이 비어있어 스킵했습니다."
+        b64 = items[0].get("b64_json")
+        url = items[0].get("url")
+        if b64:
+            out.write_bytes(base64.b64decode(b64))
+            return out, None
+        if url:
+            img_resp = session.get(url, timeout=60)
+            if img_resp.status_code < 400:
+                out.write_bytes(img_resp.content)
+                return out, None
+            return None, f"AI 이미지 {i}페이지 다운로드 실패"
+        return None, f"AI 이미지 {i}페이지 결과 형식을 인식하지 못했습니다."
+    except Exception as e:  # noqa: BLE001
+        return None, f"AI 이미지 {i}페이지 생성 중 오류: {e}"
+
+
 def create_ai_scene_images(
     face_path: Path,
     out_dir: Path,
@@ -184,8 +399,9 @@ def create_ai_scene_images(
     api_key = os.environ.get("OPENAI_API_KEY", "").strip()
     if not api_key:
         return [], ["OPENAI_API_KEY가 없어 빠른 변형 모드로 대체합니다."]
+    if not pages:
+        return [], []
 
-    headers = {"Authorization": f"Bearer {api_key}"}
     endpoint = "https://api.openai.com/v1/images/edits"
     warnings: list[str] = []
     generated: list[Path] = []
@@ -194,58 +410,31 @@ def create_ai_scene_images(
         "Children's storybook illustration, soft lighting, friendly mood, high detail, "
         "the same child identity as the reference face image."
     )
-    for i, page_text in enumerate(pages, start=1):
-        prompt = (
+    # Read the face once; each request gets its own BytesIO so threads never share a file position.
+    face_bytes = face_path.read_bytes()
+    workers = min(MAX_STORY_PAGES, len(pages))
+    # The key goes on the API call only; result URLs point at a third-party blob host.
+    headers = {"Authorization": f"Bearer {api_key}"}
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        session.mount("https://", adapter)
+        page_job = partial(_generate_ai_page, session, endpoint, headers, face_path.name, face_bytes)
+        prompts = [
             f"{style_prefix} Theme: {theme}. Tone: {tone}. Template: {template_name}. "
             f"Child name: {child_name}. Scene for page {i}: {page_text}. "
             "Keep child age-appropriate and positive."
-        )
-        with face_path.open("rb") as image_fp:
-            data = {
-                "model": "gpt-image-1",
-                "prompt": prompt,
-                "size": "1024x1024",
-            }
-            try:
-                resp = None
-                for retry in range(3):
-                    image_fp.seek(0)
-                    files = {
-                        "image": (face_path.name, image_fp, "application/octet-stream"),
-                    }
-                    resp = requests.post(endpoint, headers=headers, files=files, data=data, timeout=120)
-                    if resp.status_code < 500:
-                        break
-                    time.sleep(1.2 * (retry + 1))
-                if resp is None:
-                    warnings.append(f"AI 이미지 {i}페이지 생성 실패: 응답 없음")
-                    continue
-                if resp.status_code >= 400:
-                    detail = (resp.text or "").strip().replace("\n", " ")[:140]
-                    warnings.append(f"AI 이미지 {i}페이지 생성 실패: {resp.status_code} {detail}")
-                    continue
-                payload = resp.json()
-                items = payload.get("data", [])
-                if not items:
-                    warnings.append(f"AI 이미지 {i}페이지 응답이 비어있어 스킵했습니다.")
-                    continue
-                out = out_dir / f"page_{i:02d}.png"
-                b64 = items[0].get("b64_json")
-                url = items[0].get("url")
-                if b64:
-                    out.write_bytes(base64.b64decode(b64))
+            for i, page_text in enumerate(pages, start=1)
+        ]
+        page_numbers = range(1, len(pages) + 1)
+        outs = [out_dir / f"page_{i:02d}.png" for i in page_numbers]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # map() yields in page order regardless of which request finishes first.
+            outcomes = pool.map(page_job, prompts, outs, page_numbers)
+            for out, warning in outcomes:
+                if out is not None:
                     generated.append(out)
-                elif url:
-                    img_resp = requests.get(url, timeout=60)
-                    if img_resp.status_code < 400:
-                        out.write_bytes(img_resp.content)
-                        generated.append(out)
-                    else:
-                        warnings.append(f"AI 이미지 {i}페이지 다운로드 실패")
-                else:
-                    warnings.append(f"AI 이미지 {i}페이지 결과 형식을 인식하지 못했습니다.")
-            except Exception as e:  # noqa: BLE001
-                warnings.append(f"AI 이미지 {i}페이지 생성 중 오류: {e}")
+                if warning:
+                    warnings.append(warning)
     return generated, warnings
 
 
@@ -267,7 +456,7 @@ def create_storybook_from_face(
     face_path = normalize_face_image(face_upload, out_dir)
 
     title = f"{child_name}의 {template_name}"
-    pages = build_story_pages(child_name, template_name, custom_story)
+    pages = list(build_story_pages(child_name, template_name, custom_story))
     warnings: list[str] = []
     page_images: list[Path] = []
     if image_mode == "AI 장면 생성 (Beta)":
@@ -286,30 +475,16 @@ def create_storybook_from_face(
             warnings.append("AI 생성이 일부/전체 실패하여 빠른 변형 모드 결과로 대체했습니다.")
 
     story_path = out_dir / "storybook.md"
-    lines = [
-        f"# {title}",
-        "",
-        f"- 아이 이름: {child_name}",
-        f"- 테마: {theme}",
-        f"- 분위기: {tone}",
-        f"- 동화책 종류: {template_name}",
-        "",
-    ]
-    for i, page in enumerate(pages, start=1):
-        page_img = page_images[i - 1]
-        lines.append(f"## {i}페이지")
-        lines.append(f"![{child_name} 페이지 이미지]({page_img.name})")
-        lines.append("")
-        lines.append(page)
-        lines.append("")
-    lines.extend(
-        [
-            "## 얼굴 참조 이미지",
-            f"![face]({face_path.name})",
-            "",
-        ]
+    page_md = "".join(
+        STORYBOOK_PAGE_MD.format(i=i, child=child_name, image=page_img.name, body=page)
+        for i, (page, page_img) in enumerate(zip(pages, page_images), start=1)
+    )
+    story_path.write_text(
+        f"# {title}\n\n"
+        f"- 아이 이름: {child_name}\n- 테마: {theme}\n- 분위기: {tone}\n- 동화책 종류: {template_name}\n\n"
+        f"{page_md}## 얼굴 참조 이미지\n![face]({face_path.name})\n",
+        encoding="utf-8",
     )
-    story_path.write_text("\n".join(lines), encoding="utf-8")
     manifest = {
         "title": title,
         "child_name": child_name,
@@ -322,21 +497,50 @@ def create_storybook_from_face(
         "page_images": [p.name for p in page_images],
         "warnings": warnings,
     }
-    (out_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
     return out_dir, story_path, face_path, page_images, pages, title, warnings
 
 
 def build_storybook_bundle_bytes(story_dir: Path) -> bytes:
     buf = BytesIO()
-    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+    # Only the small md/json members are deflated; level 1 is near-identical in size at a fraction of the CPU.
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
         for p in sorted(story_dir.iterdir()):
             if p.is_file():
-                zf.write(p, arcname=p.name)
-    buf.seek(0)
+                compress_type = zipfile.ZIP_STORED if p.suffix.lower() in PRECOMPRESSED_SUFFIXES else None
+                zf.write(p, arcname=p.name, compress_type=compress_type)
     return buf.getvalue()
 
 
-def create_storybook_pdf_bytes(
+def build_output_archive(output_root: Path) -> Path:
+    zip_path = output_root.with_name(output_root.name + ".zip")
+    sig_path = zip_path.with_name(zip_path.name + ".sig")
+    files: list[Path] = []
+    # Fingerprint exactly what the walk saw. Unlike comparing mtimes against the zip's own
+    # timestamp, this still notices files written mid-walk or deleted since the last build.
+    sig = hashlib.blake2b(digest_size=16)
+    for dirpath, _, filenames in os.walk(output_root):
+        for name in sorted(filenames):
+            full = Path(dirpath) / name
+            info = full.stat()
+            sig.update(f"{full.relative_to(output_root)}\0{info.st_size}\0{info.st_mtime_ns}\n".encode())
+            files.append(full)
+    digest = sig.hexdigest()
+    if zip_path.exists() and sig_path.exists() and sig_path.read_text(encoding="utf-8") == digest:
+        return zip_path
+
+    tmp_path = zip_path.with_name(zip_path.name + ".tmp")
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1, allowZip64=True) as zf:
+        for full in files:
+            compress_type = zipfile.ZIP_STORED if full.suffix.lower() in PRECOMPRESSED_SUFFIXES else None
+            zf.write(full, arcname=full.relative_to(output_root), compress_type=compress_type)
+    os.replace(tmp_path, zip_path)
+    sig_path.write_text(digest, encoding="utf-8")
+    return zip_path
+
+
+def create_storybook_pdf(
+    pdf_path: Path,
     title: str,
     child_name: str,
     theme: str,
@@ -344,12 +548,13 @@ def create_storybook_pdf_bytes(
     template_name: str,
     pages: list[str],
     page_image_paths: list[str] | None = None,
-) -> bytes:
+) -> bool:
     if not PDF_AVAILABLE:
-        return b""
+        return False
 
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
+    # Render straight to disk; the rename keeps a half-written file from ever looking finished.
+    tmp_path = pdf_path.with_name(pdf_path.name + ".tmp")
+    c = canvas.Canvas(str(tmp_path), pagesize=A4)
     width, height = A4
 
     font_name = "Helvetica"
@@ -372,6 +577,8 @@ def create_storybook_pdf_bytes(
     cover_y -= 16
     c.drawString(40, cover_y, f"Template: {template_name}")
 
+    # Decode each page image once, even if several pages point at the same file.
+    image_cache: dict[str, tuple[Any, bool]] = {}
     for idx, page in enumerate(pages, start=1):
         c.showPage()
         y = height - 50
@@ -387,7 +594,12 @@ def create_storybook_pdf_bytes(
             p = Path(current_image)
             if p.exists():
                 try:
-                    img = ImageReader(str(p))
+                    if current_image not in image_cache:
+                        with Image.open(p) as pil_img:
+                            pil_img.load()
+                            has_alpha = "A" in pil_img.getbands() or "transparency" in pil_img.info
+                            image_cache[current_image] = (ImageReader(pil_img.copy()), has_alpha)
+                    img, has_alpha = image_cache[current_image]
                     img_w, img_h = img.getSize()
                     target_w = width - 80
                     target_h = 260
@@ -395,7 +607,15 @@ def create_storybook_pdf_bytes(
                     draw_w = img_w * scale
                     draw_h = img_h * scale
                     x = 40 + (target_w - draw_w) / 2
-                    c.drawImage(img, x, y - draw_h, width=draw_w, height=draw_h, preserveAspectRatio=True, mask="auto")
+                    c.drawImage(
+                        img,
+                        x,
+                        y - draw_h,
+                        width=draw_w,
+                        height=draw_h,
+                        preserveAspectRatio=True,
+                        mask="auto" if has_alpha else None,
+                    )
                     y -= draw_h + 20
                 except Exception:  # noqa: BLE001
                     pass
@@ -410,8 +630,27 @@ def create_storybook_pdf_bytes(
             y -= 15
 
     c.save()
-    buffer.seek(0)
-    return buffer.getvalue()
+    os.replace(tmp_path, pdf_path)
+    return True
+
+
+def _list_present_files(paths: Any) -> dict[Path, set[str]]:
+    # One directory listing per parent instead of exists()/is_file() stats per preview row.
+    present: dict[Path, set[str]] = {}
+    for parent in {p.parent for p in paths}:
+        try:
+            with os.scandir(parent) as it:
+                present[parent] = {e.name for e in it if e.is_file()}
+        except OSError:
+            present[parent] = set()
+    return present
+
+
+def changed_editor_rows(edited: Any, original: Any) -> Any:
+    # Only rows that differ from the loaded data (or were added) need an UPDATE.
+    base = original.reindex(edited.index)
+    diff = edited.ne(base) & ~(edited.isna() & base.isna())
+    return edited[diff.any(axis=1)]
 
 
 def require_password_if_needed() -> None:
@@ -424,64 +663,176 @@ def require_password_if_needed() -> None:
         st.stop()
 
 
-def process_queue(conn, pending_rows: list[dict], output_root: Path, width: int, height: int, timeout_ms: int, retries: int):
-    grouped: dict[tuple[str, str, str], list[dict]] = defaultdict(list)
-    for row in pending_rows:
-        grouped[(row["brand"], row["season"], row["item"])].append(row)
-
-    ids = [r["id"] for r in pending_rows]
-    mark_processing(conn, ids)
-
-    processed = 0
-    failed = 0
-    for (brand, season, item), rows in grouped.items():
-        cfg = CaptureConfig(
-            output_root=output_root,
-            brand=brand,
-            season=season,
-            item=item,
-            width=width,
-            height=height,
-            timeout_ms=timeout_ms,
-            max_retries=retries,
+def process_queue(
+    conn,
+    pending_rows: list[dict],
+    output_root: Path,
+    width: int,
+    height: int,
+    timeout_ms: int,
+    retries: int,
+    max_parallel_groups: int = MAX_CAPTURE_WORKERS,
+    on_progress: Callable[[int], None] | None = None,
+    mark: bool = True,
+):
+    group_key = itemgetter("brand", "season", "item")
+    grouped = [(key, list(rows)) for key, rows in groupby(sorted(pending_rows, key=group_key), key=group_key)]
+
+    if mark:
+        mark_processing(conn, [r["id"] for r in pending_rows])
+
+    if not grouped:
+        return 0, 0
+
+    # Same runner as worker.py: one Chromium for the whole queue, up to max_parallel_groups
+    # groups in flight on one event loop, and every sqlite write on this thread.
+    return asyncio.run(
+        capture_groups(
+            conn,
+            grouped,
+            output_root,
+            width,
+            height,
+            timeout_ms,
+            retries,
+            max_parallel_groups=max_parallel_groups,
+            on_progress=on_progress,
         )
-        urls = [r["source_url"] for r in rows]
-        try:
-            results = capture_urls(urls, cfg, start_index=1)
-            for source_row, result in zip(rows, results):
-                apply_capture_result(conn, source_row["id"], result)
-                if result.get("status") == "SUCCESS":
-                    processed += 1
-                else:
-                    failed += 1
-        except Exception as e:  # noqa: BLE001
-            for source_row in rows:
-                apply_capture_result(
-                    conn,
-                    source_row["id"],
-                    {"status": "FAILED", "error_message": str(e), "image_path": "", "captured_at": ""},
-                )
-                failed += 1
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _background_executor(kind: str) -> ThreadPoolExecutor:
+    # Single worker per kind: jobs of one kind queue up instead of competing for sqlite or disk.
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{kind}-job")
+
+
+def _process_queue_in_background(
+    db_path_str: str,
+    pending_rows: list[dict],
+    output_root: Path,
+    width: int,
+    height: int,
+    timeout_ms: int,
+    retries: int,
+    max_parallel_groups: int,
+    progress: dict[str, int],
+):
+    # Own connection: the cached one is shared with the Streamlit script thread.
+    conn = db_conn(Path(db_path_str))
+    try:
+        return process_queue(
+            conn,
+            pending_rows,
+            output_root,
+            width,
+            height,
+            timeout_ms,
+            retries,
+            max_parallel_groups,
+            on_progress=partial(progress.__setitem__, "done"),
+            mark=False,
+        )
+    finally:
+        conn.close()
+
+
+@st.fragment(run_every=2)
+def show_capture_job_status() -> None:
+    job = st.session_state.get("capture_job")
+    if not job:
+        return
+    future = job["future"]
+    if not future.done():
+        # Counted by the job itself; global PROCESSING counts also include other runs.
+        done_n = job["progress"]["done"]
+        st.progress(min(1.0, done_n / job["total"]), text=f"수집 실행 중 ({done_n}/{job['total']}건)")
+        return
+    st.session_state.pop("capture_job")
+    try:
+        success_n, failed_n = future.result()
+        st.session_state["capture_job_message"] = (
+            True,
+            f"등록 {job['inserted']}건 / 중복 {job['duplicated']}건 / 캡처성공 {success_n}건 / 실패 {failed_n}건",
+        )
+    except Exception as e:  # noqa: BLE001
+        st.session_state["capture_job_message"] = (False, f"수집 실패: {e}")
+    invalidate_query_cache()
+    st.rerun()
+
+
+@st.fragment(run_every=2)
+def show_archive_job_status() -> None:
+    future = st.session_state.get("archive_job")
+    if future is None:
+        return
+    if not future.done():
+        st.info("압축 생성 중...")
+        return
+    st.session_state.pop("archive_job")
+    try:
+        st.session_state["archive_job_message"] = (True, f"압축 생성: {future.result()}")
+    except Exception as e:  # noqa: BLE001
+        st.session_state["archive_job_message"] = (False, f"압축 생성 실패: {e}")
+    st.rerun()
+
 
-    return processed, failed
+@st.fragment
+def render_preview(edited: Any) -> None:
+    # Fragment: moving the slider reruns only this block, not the DB queries above it.
+    st.subheader("5) 미리보기")
+    preview_n = st.slider("미리보기 수", min_value=1, max_value=30, value=8)
+    preview_rows = edited.head(preview_n)
+    present_files = _list_present_files(
+        Path(p) for p in (str(v).strip() for v in preview_rows.get("image_path", [])) if p
+    )
+    # Rows with an image go into one batched st.image call; only problem rows get their own elements.
+    images: list[str] = []
+    captions: list[str] = []
+    for _, row in preview_rows.iterrows():
+        label = f"{row.get('brand', '')}/{row.get('season', '')}/{row.get('item', '')} | {row.get('status', '')}"
+        source_url = str(row.get("source_url", ""))
+        image_path = str(row.get("image_path", "")).strip()
+        p = Path(image_path)
+        has_image = bool(image_path) and p.name in present_files.get(p.parent, ())
+        if has_image:
+            images.append(image_path)
+            captions.append(f"{label}\n{source_url}")
+        error_message = str(row.get("error_message", "")).strip()
+        if has_image and not error_message:
+            continue
+        st.caption(label)
+        st.caption(source_url)
+        if not image_path:
+            st.warning("이미지 경로 없음")
+        elif not has_image:
+            st.warning(f"이미지 없음: {p}")
+        if error_message:
+            st.error(error_message)
+    if images:
+        st.image(images, caption=captions, width=PREVIEW_IMAGE_WIDTH)
 
 
 st.set_page_config(page_title="APC GOLF Reference Hub", layout="wide")
 st.title("APC GOLF Reference Hub v1")
 
-with st.sidebar:
+with st.sidebar, st.form("system_config"):
     st.header("System")
-    db_path = Path(st.text_input("DB Path", value=str(DEFAULT_DB_PATH))).expanduser().resolve()
-    output_root = Path(st.text_input("Output Root", value=str(DEFAULT_OUTPUT_ROOT))).expanduser().resolve()
-    export_csv_path = Path(st.text_input("Export CSV Path", value=str(DEFAULT_EXPORT_CSV))).expanduser().resolve()
+    db_path = _resolve_path(st.text_input("DB Path", value=str(DEFAULT_DB_PATH)))
+    output_root = _resolve_path(st.text_input("Output Root", value=str(DEFAULT_OUTPUT_ROOT)))
+    export_csv_path = _resolve_path(st.text_input("Export CSV Path", value=str(DEFAULT_EXPORT_CSV)))
     width = int(st.number_input("Viewport Width", min_value=800, max_value=3000, value=1600))
     height = int(st.number_input("Viewport Height", min_value=1000, max_value=4000, value=2200))
     timeout_ms = int(st.number_input("Timeout (ms)", min_value=5000, max_value=120000, value=30000, step=1000))
     retries = int(st.number_input("Retries", min_value=0, max_value=5, value=2))
+    max_parallel_groups = int(
+        st.number_input("Parallel Groups", min_value=1, max_value=8, value=MAX_CAPTURE_WORKERS)
+    )
+    st.form_submit_button("Apply", width="stretch")
 
 require_password_if_needed()
 conn = get_conn(db_path)
-metric = stats(conn)
+metric = _cached_stats(str(db_path), _db_version(db_path))
 
 top1, top2, top3, top4, top5 = st.columns(5)
 top1.metric("TOTAL", metric["TOTAL"])
@@ -495,35 +846,56 @@ st.subheader("1) 원클릭 수집 (추천)")
 quick_col1, quick_col2, quick_col3 = st.columns(3)
 quick_brand = _slug(quick_col1.text_input("Quick Brand", value="apc-golf"))
 quick_season = _slug(quick_col2.text_input("Quick Season", value="2026-ss"))
-quick_item = _slug(quick_col3.selectbox("Quick Item", ["tee", "pants", "outer", "knit", "other"], index=0))
+quick_item = quick_col3.selectbox("Quick Item", ITEM_CHOICES, index=0)
 quick_urls = st.text_area(
     "URL 붙여넣기 (한 줄 하나)",
     placeholder="https://www.vogue.com/fashion-shows/...\nhttps://brand.com/lookbook/...",
     height=120,
 )
-if st.button("원클릭 수집 실행 (등록+캡처)", type="primary", width="stretch"):
+capture_running = "capture_job" in st.session_state
+if st.button("원클릭 수집 실행 (등록+캡처)", type="primary", width="stretch", disabled=capture_running):
     urls = read_urls(quick_urls)
     if not urls:
         st.warning("최소 1개 URL이 필요합니다.")
     else:
         rows = [RefRow(brand=quick_brand, season=quick_season, item=quick_item, source_url=u) for u in urls]
         inserted, duplicated = enqueue_urls(conn, rows)
-        pending_rows = list_pending(conn, limit=300)
-        success_n = 0
-        failed_n = 0
+        invalidate_query_cache()
+        pending_rows = claim_pending(conn, limit=300)
         if pending_rows:
-            with st.spinner(f"수집 실행 중 ({len(pending_rows)}건)"):
-                success_n, failed_n = process_queue(conn, pending_rows, output_root, width, height, timeout_ms, retries)
-        st.success(
-            f"등록 {inserted}건 / 중복 {duplicated}건 / 캡처성공 {success_n}건 / 실패 {failed_n}건"
-        )
+            progress = {"done": 0}
+            st.session_state["capture_job"] = {
+                "future": _background_executor("capture").submit(
+                    _process_queue_in_background,
+                    str(db_path),
+                    pending_rows,
+                    output_root,
+                    width,
+                    height,
+                    timeout_ms,
+                    retries,
+                    max_parallel_groups,
+                    progress,
+                ),
+                "progress": progress,
+                "total": len(pending_rows),
+                "inserted": inserted,
+                "duplicated": duplicated,
+            }
+            st.rerun()
+        st.success(f"등록 {inserted}건 / 중복 {duplicated}건 / 캡처성공 0건 / 실패 0건")
+if "capture_job_message" in st.session_state:
+    job_ok, job_message = st.session_state.pop("capture_job_message")
+    (st.success if job_ok else st.error)(job_message)
+if capture_running:
+    show_capture_job_status()
 
 st.divider()
 st.subheader("2) URL 큐 등록 (고급)")
 form_col1, form_col2, form_col3 = st.columns(3)
 brand = _slug(form_col1.text_input("Brand", value="apc-golf"))
 season = _slug(form_col2.text_input("Season", value="2026-ss"))
-item = _slug(form_col3.selectbox("Item", ["tee", "pants", "outer", "knit", "other"], index=0))
+item = form_col3.selectbox("Item", ITEM_CHOICES, index=0)
 url_text = st.text_area("URL 리스트(한 줄 하나)", placeholder="https://...", height=160)
 
 queue_col1, queue_col2, queue_col3 = st.columns(3)
@@ -531,20 +903,25 @@ if queue_col1.button("큐 등록", type="primary", width="stretch"):
     urls = read_urls(url_text)
     rows = [RefRow(brand=brand, season=season, item=item, source_url=u) for u in urls]
     inserted, duplicated = enqueue_urls(conn, rows)
+    invalidate_query_cache()
     st.success(f"등록 {inserted}건, 중복 {duplicated}건")
 
-if queue_col2.button("PENDING 처리 실행", width="stretch"):
-    pending_rows = list_pending(conn, limit=300)
+if queue_col2.button("PENDING 처리 실행", width="stretch", disabled=capture_running):
+    pending_rows = claim_pending(conn, limit=300)
     if not pending_rows:
         st.info("처리할 PENDING 항목이 없습니다.")
     else:
         with st.spinner(f"캡처 처리 중 ({len(pending_rows)}건)"):
-            success_n, failed_n = process_queue(conn, pending_rows, output_root, width, height, timeout_ms, retries)
+            success_n, failed_n = process_queue(
+                conn, pending_rows, output_root, width, height, timeout_ms, retries, max_parallel_groups, mark=False
+            )
+        invalidate_query_cache()
         st.success(f"완료: 성공 {success_n}건 / 실패 {failed_n}건")
 
 if queue_col3.button("FAILED -> PENDING 재시도", width="stretch"):
     failed_rows = list_failed(conn, limit=300)
     cnt = reset_to_pending(conn, [r["id"] for r in failed_rows])
+    invalidate_query_cache()
     st.success(f"{cnt}건을 재시도 대기 상태로 변경")
 
 st.subheader("3) 파일 업로드 (로컬 이미지/리포트)")
@@ -559,15 +936,18 @@ if st.button("업로드 저장 및 레코드 등록", width="stretch"):
     else:
         raw_dir = output_root / brand / season / item / "raw"
         saved_paths = save_uploaded_files(uploaded_assets, raw_dir)
-        for p in saved_paths:
-            save_uploaded_asset(
-                conn,
-                brand=brand,
-                season=season,
-                item=item,
-                source_url=f"local://{Path(p).name}",
-                image_path=p,
-            )
+        # One commit for the whole upload instead of one per file.
+        with write_transaction(conn):
+            for p in saved_paths:
+                save_uploaded_asset(
+                    conn,
+                    brand=brand,
+                    season=season,
+                    item=item,
+                    source_url=f"local://{Path(p).name}",
+                    image_path=p,
+                )
+        invalidate_query_cache()
         st.success(f"{len(saved_paths)}건 저장 및 인덱싱 완료")
 
 st.subheader("3-1) 아이 얼굴로 즉시 동화책 만들기")
@@ -596,6 +976,8 @@ if "face_storybook_sig" not in st.session_state:
     st.session_state["face_storybook_sig"] = ""
 if "face_storybook_result" not in st.session_state:
     st.session_state["face_storybook_result"] = None
+if "face_storybook_history" not in st.session_state:
+    st.session_state["face_storybook_history"] = {}
 
 if face_upload is None:
     st.info("얼굴 이미지를 업로드하면 자동으로 동화책이 생성됩니다.")
@@ -604,22 +986,28 @@ else:
     if int(face_upload.size or 0) > max_bytes:
         st.error(f"파일이 너무 큽니다. {MAX_FACE_UPLOAD_MB}MB 이하 이미지를 업로드해 주세요.")
         st.stop()
-    sig = "|".join(
-        [
-            face_upload.name,
-            str(face_upload.size),
-            child_name.strip(),
-            storybook_theme.strip(),
-            tone.strip(),
-            storybook_kind.strip(),
-            image_mode.strip(),
-            custom_story.strip(),
-            str(st.session_state.get("face_storybook_nonce", 0)),
-        ]
-    )
     if regenerate:
         st.session_state["face_storybook_nonce"] = int(st.session_state.get("face_storybook_nonce", 0)) + 1
-        sig = sig + f"|regen:{st.session_state['face_storybook_nonce']}"
+    # Hash the image bytes themselves: re-uploads with the same name and size must still regenerate.
+    sig_hash = hashlib.blake2b(face_upload.getbuffer(), digest_size=16)
+    for part in (
+        child_name.strip(),
+        storybook_theme.strip(),
+        tone.strip(),
+        storybook_kind.strip(),
+        image_mode.strip(),
+        custom_story.strip(),
+        str(st.session_state.get("face_storybook_nonce", 0)),
+    ):
+        sig_hash.update(part.encode("utf-8"))
+        sig_hash.update(b"\0")
+    sig = sig_hash.hexdigest()
+    history = st.session_state["face_storybook_history"]
+    previous = history.get(sig)
+    if sig != st.session_state["face_storybook_sig"] and previous and Path(previous["dir"]).exists():
+        # Same image bytes and options as an earlier run: reuse its output instead of regenerating.
+        st.session_state["face_storybook_sig"] = sig
+        st.session_state["face_storybook_result"] = previous
     if sig != st.session_state["face_storybook_sig"]:
         clean_child_name = child_name.strip() or "아이"
         clean_theme = storybook_theme.strip() or "즐거운 모험"
@@ -652,6 +1040,9 @@ else:
                     "pages": pages,
                     "warnings": warnings,
                 }
+                history[sig] = st.session_state["face_storybook_result"]
+                while len(history) > STORYBOOK_HISTORY_SIZE:
+                    history.pop(next(iter(history)))
             except Exception as e:  # noqa: BLE001
                 st.error(f"동화책 생성 실패: {e}")
                 st.session_state["face_storybook_result"] = None
@@ -683,7 +1074,9 @@ else:
                 key="download_storybook_md",
             )
             if PDF_AVAILABLE:
-                pdf_bytes = create_storybook_pdf_bytes(
+                pdf_path = Path(result["dir"]) / "storybook.pdf"
+                pdf_ready = pdf_path.exists() or create_storybook_pdf(
+                    pdf_path,
                     title=result.get("title", "Storybook"),
                     child_name=result.get("child_name", ""),
                     theme=result.get("theme", ""),
@@ -692,12 +1085,10 @@ else:
                     pages=result.get("pages", []),
                     page_image_paths=result.get("page_image_paths", []),
                 )
-                if pdf_bytes:
-                    pdf_path = Path(result["dir"]) / "storybook.pdf"
-                    pdf_path.write_bytes(pdf_bytes)
+                if pdf_ready:
                     st.download_button(
                         "동화책 PDF 다운로드",
-                        data=pdf_bytes,
+                        data=pdf_path.read_bytes(),
                         file_name="storybook.pdf",
                         mime="application/pdf",
                         width="stretch",
@@ -726,34 +1117,14 @@ f_item = flt3.text_input("Filter item", "")
 f_status = flt4.selectbox("Filter status", ["ALL", "PENDING", "PROCESSING", "SUCCESS", "FAILED"], index=0)
 limit = int(flt5.number_input("Limit", min_value=50, max_value=10000, value=1000, step=50))
 
-df = list_references(conn, brand=f_brand, season=f_season, item=f_item, status=f_status, limit=limit)
+df = _cached_list_references(
+    str(db_path), _db_version(db_path), f_brand, f_season, f_item, f_status, limit
+)
 if df.empty:
     st.info("조회 결과가 없습니다.")
 else:
-    editable_cols = [
-        "id",
-        "brand",
-        "season",
-        "item",
-        "source_url",
-        "image_path",
-        "captured_at",
-        "SILHOUETTE",
-        "COLOR",
-        "DETAIL",
-        "MATERIAL",
-        "MOOD",
-        "FUNCTION",
-        "USE_CASE",
-        "fit_key",
-        "apc_fit_score",
-        "notes",
-        "status",
-        "error_message",
-        "updated_at",
-    ]
     edited = st.data_editor(
-        df[editable_cols],
+        df,
         width="stretch",
         hide_index=True,
         num_rows="dynamic",
@@ -761,35 +1132,27 @@ else:
     )
     save1, save2 = st.columns(2)
     if save1.button("태그/메모 저장", type="primary", width="stretch"):
-        count = update_edited_rows(conn, edited.to_dict("records"))
+        count = update_edited_rows(conn, changed_editor_rows(edited, df).to_dict("records"))
+        invalidate_query_cache()
         st.success(f"{count}건 저장")
     if save2.button("DB -> index.csv 내보내기", width="stretch"):
         out_csv = export_csv(conn, export_csv_path)
         st.success(f"내보내기 완료: {out_csv}")
 
-    st.subheader("5) 미리보기")
-    preview_n = st.slider("미리보기 수", min_value=1, max_value=30, value=8)
-    for _, row in edited.head(preview_n).iterrows():
-        st.caption(f"{row.get('brand', '')}/{row.get('season', '')}/{row.get('item', '')} | {row.get('status', '')}")
-        st.caption(str(row.get("source_url", "")))
-        image_path = str(row.get("image_path", "")).strip()
-        if image_path:
-            p = Path(image_path)
-            if p.exists() and p.is_file():
-                st.image(str(p), width="stretch")
-            else:
-                st.warning(f"이미지 없음: {p}")
-        else:
-            st.warning("이미지 경로 없음")
-        if str(row.get("error_message", "")).strip():
-            st.error(str(row.get("error_message")))
+    render_preview(edited)
 
 st.divider()
 st.subheader("6) 아카이브")
 zip_col1, zip_col2 = st.columns(2)
-if zip_col1.button("출력 폴더 ZIP 생성", width="stretch"):
+archive_running = "archive_job" in st.session_state
+if zip_col1.button("출력 폴더 ZIP 생성", width="stretch", disabled=archive_running):
     output_root.mkdir(parents=True, exist_ok=True)
-    zip_path = shutil.make_archive(str(output_root), "zip", str(output_root))
-    st.success(f"압축 생성: {zip_path}")
+    st.session_state["archive_job"] = _background_executor("archive").submit(build_output_archive, output_root)
+    st.rerun()
+if "archive_job_message" in st.session_state:
+    archive_ok, archive_message = st.session_state.pop("archive_job_message")
+    (st.success if archive_ok else st.error)(archive_message)
+if archive_running:
+    show_archive_job_status()
 if zip_col2.button("새로고침", width="stretch"):
     st.rerun()
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import csv
 import sqlite3
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
@@ -43,6 +46,12 @@ def db_conn(db_path: Path) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(str(db_path), check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA mmap_size=268435456")
     return conn
 
 
@@ -80,6 +89,25 @@ def init_db(conn: sqlite3.Connection) -> None:
         ON reference_items (brand, season, item, source_url)
         """
     )
+    # list_pending/list_failed walk these in ORDER BY order; the status prefix also serves stats().
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_ref_status_created ON reference_items (status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_ref_status_updated ON reference_items (status, updated_at)")
+    conn.commit()
+
+
+@contextmanager
+def write_transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    # Nested use joins the outer transaction, which owns the commit/rollback.
+    if conn.in_transaction:
+        yield conn
+        return
+    # Take the writer lock up front so busy_timeout covers the whole batch.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
     conn.commit()
 
 
@@ -88,18 +116,19 @@ def now_iso() -> str:
 
 
 def enqueue_urls(conn: sqlite3.Connection, rows: list[RefRow]) -> tuple[int, int]:
-    inserted = 0
-    duplicated = 0
-    for row in rows:
-        ts = now_iso()
-        try:
-            conn.execute(
-                """
-                INSERT INTO reference_items (
-                  id, brand, season, item, source_url, created_at, updated_at, status
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, 'PENDING')
-                """,
+    if not rows:
+        return 0, 0
+    ts = now_iso()
+    before = conn.total_changes
+    with write_transaction(conn):
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO reference_items (
+              id, brand, season, item, source_url, created_at, updated_at, status
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'PENDING')
+            """,
+            [
                 (
                     f"{row.brand}_{row.season}_{row.item}_{uuid4().hex[:16]}",
                     row.brand,
@@ -108,13 +137,12 @@ def enqueue_urls(conn: sqlite3.Connection, rows: list[RefRow]) -> tuple[int, int
                     row.source_url,
                     ts,
                     ts,
-                ),
-            )
-            inserted += 1
-        except sqlite3.IntegrityError:
-            duplicated += 1
-    conn.commit()
-    return inserted, duplicated
+                )
+                for row in rows
+            ],
+        )
+    inserted = conn.total_changes - before
+    return inserted, len(rows) - inserted
 
 
 def list_references(
@@ -124,7 +152,12 @@ def list_references(
     item: str = "",
     status: str = "ALL",
     limit: int = 5000,
+    columns: Sequence[str] | None = None,
 ) -> pd.DataFrame:
+    select_cols = list(columns) if columns else BASE_COLUMNS
+    unknown = [c for c in select_cols if c not in BASE_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown columns: {unknown}")
     conds = []
     params: list[Any] = []
     if brand.strip():
@@ -141,7 +174,7 @@ def list_references(
         params.append(status)
     where_sql = ("WHERE " + " AND ".join(conds)) if conds else ""
     query = f"""
-        SELECT {", ".join(BASE_COLUMNS)}
+        SELECT {", ".join(select_cols)}
         FROM reference_items
         {where_sql}
         ORDER BY updated_at DESC
@@ -183,43 +216,62 @@ def mark_processing(conn: sqlite3.Connection, ids: list[str]) -> None:
     if not ids:
         return
     ts = now_iso()
-    q = ",".join("?" for _ in ids)
-    conn.execute(
-        f"UPDATE reference_items SET status='PROCESSING', updated_at=? WHERE id IN ({q})",
-        (ts, *ids),
-    )
-    conn.commit()
+    with write_transaction(conn):
+        conn.executemany(
+            "UPDATE reference_items SET status='PROCESSING', updated_at=? WHERE id = ?",
+            [(ts, rid) for rid in ids],
+        )
 
 
-def apply_capture_result(conn: sqlite3.Connection, source_id: str, result: dict[str, Any]) -> None:
-    ts = now_iso()
+def claim_pending(conn: sqlite3.Connection, limit: int = 100) -> list[dict[str, Any]]:
+    # List and mark under one write lock so concurrent runs (other sessions, worker.py)
+    # can never pick up the same PENDING rows.
+    with write_transaction(conn):
+        rows = list_pending(conn, limit=limit)
+        mark_processing(conn, [r["id"] for r in rows])
+    return rows
+
+
+def _capture_result_params(source_id: str, result: dict[str, Any], ts: str) -> tuple[Any, ...]:
     score = None
     try:
         score = int(result.get("apc_fit_score")) if result.get("apc_fit_score") else None
     except Exception:
         score = None
-    conn.execute(
-        """
-        UPDATE reference_items
-        SET image_path = COALESCE(?, ''),
-            captured_at = COALESCE(?, ''),
-            status = ?,
-            error_message = COALESCE(?, ''),
-            apc_fit_score = ?,
-            updated_at = ?
-        WHERE id = ?
-        """,
-        (
-            result.get("image_path", ""),
-            result.get("captured_at", ""),
-            result.get("status", "FAILED"),
-            result.get("error_message", ""),
-            score,
-            ts,
-            source_id,
-        ),
+    return (
+        result.get("image_path", ""),
+        result.get("captured_at", ""),
+        result.get("status", "FAILED"),
+        result.get("error_message", ""),
+        score,
+        ts,
+        source_id,
     )
-    conn.commit()
+
+
+def apply_capture_results(conn: sqlite3.Connection, pairs: list[tuple[str, dict[str, Any]]]) -> None:
+    if not pairs:
+        return
+    ts = now_iso()
+    params = [_capture_result_params(source_id, result, ts) for source_id, result in pairs]
+    with write_transaction(conn):
+        conn.executemany(
+            """
+            UPDATE reference_items
+            SET image_path = COALESCE(?, ''),
+                captured_at = COALESCE(?, ''),
+                status = ?,
+                error_message = COALESCE(?, ''),
+                apc_fit_score = ?,
+                updated_at = ?
+            WHERE id = ?
+            """,
+            params,
+        )
+
+
+def apply_capture_result(conn: sqlite3.Connection, source_id: str, result: dict[str, Any]) -> None:
+    apply_capture_results(conn, [(source_id, result)])
 
 
 def reset_to_pending(conn: sqlite3.Connection, ids: list[str]) -> int:
@@ -227,25 +279,22 @@ def reset_to_pending(conn: sqlite3.Connection, ids: list[str]) -> int:
         return 0
     q = ",".join("?" for _ in ids)
     ts = now_iso()
-    cur = conn.execute(
-        f"""
-        UPDATE reference_items
-        SET status='PENDING', error_message='', updated_at=?
-        WHERE id IN ({q})
-        """,
-        (ts, *ids),
-    )
-    conn.commit()
+    with write_transaction(conn):
+        cur = conn.execute(
+            f"""
+            UPDATE reference_items
+            SET status='PENDING', error_message='', updated_at=?
+            WHERE id IN ({q})
+            """,
+            (ts, *ids),
+        )
     return cur.rowcount
 
 
 def update_edited_rows(conn: sqlite3.Connection, rows: list[dict[str, Any]]) -> int:
-    updated = 0
-    for row in rows:
-        if not row.get("id"):
-            continue
-        ts = now_iso()
-        values = [
+    ts = now_iso()
+    params = [
+        (
             str(row.get("SILHOUETTE", "")),
             str(row.get("COLOR", "")),
             str(row.get("DETAIL", "")),
@@ -259,8 +308,14 @@ def update_edited_rows(conn: sqlite3.Connection, rows: list[dict[str, Any]]) ->
             str(row.get("status", "")) or "SUCCESS",
             ts,
             str(row["id"]),
-        ]
-        conn.execute(
+        )
+        for row in rows
+        if row.get("id")
+    ]
+    if not params:
+        return 0
+    with write_transaction(conn):
+        conn.executemany(
             """
             UPDATE reference_items
             SET SILHOUETTE=?,
@@ -277,11 +332,9 @@ def update_edited_rows(conn: sqlite3.Connection, rows: list[dict[str, Any]]) ->
                 updated_at=?
             WHERE id=?
             """,
-            tuple(values),
+            params,
         )
-        updated += 1
-    conn.commit()
-    return updated
+    return len(params)
 
 
 def save_uploaded_asset(
@@ -295,32 +348,37 @@ def save_uploaded_asset(
 ) -> str:
     ts = now_iso()
     rid = f"{brand}_{season}_{item}_{uuid4().hex[:16]}"
-    conn.execute(
-        """
-        INSERT OR IGNORE INTO reference_items (
-          id, brand, season, item, source_url, image_path, captured_at,
-          status, created_at, updated_at
+    with write_transaction(conn):
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO reference_items (
+              id, brand, season, item, source_url, image_path, captured_at,
+              status, created_at, updated_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'SUCCESS', ?, ?)
+            """,
+            (rid, brand, season, item, source_url, image_path, ts, ts, ts),
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, 'SUCCESS', ?, ?)
-        """,
-        (rid, brand, season, item, source_url, image_path, ts, ts, ts),
-    )
-    conn.commit()
     return rid
 
 
 def export_csv(conn: sqlite3.Connection, target_csv: Path) -> Path:
-    df = pd.read_sql_query(f"SELECT {', '.join(BASE_COLUMNS)} FROM reference_items ORDER BY updated_at DESC", conn)
+    # Stream rows straight from the cursor; no DataFrame is needed just to write a file.
+    cur = conn.execute(f"SELECT {', '.join(BASE_COLUMNS)} FROM reference_items ORDER BY updated_at DESC")
     target_csv.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(target_csv, index=False)
+    with target_csv.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(BASE_COLUMNS)
+        writer.writerows(cur)
     return target_csv
 
 
 def stats(conn: sqlite3.Connection) -> dict[str, int]:
-    data: dict[str, int] = {}
-    for status in ["PENDING", "PROCESSING", "SUCCESS", "FAILED"]:
-        c = conn.execute("SELECT COUNT(1) FROM reference_items WHERE status = ?", (status,)).fetchone()[0]
-        data[status] = int(c or 0)
-    total = conn.execute("SELECT COUNT(1) FROM reference_items").fetchone()[0]
-    data["TOTAL"] = int(total or 0)
+    data: dict[str, int] = {"PENDING": 0, "PROCESSING": 0, "SUCCESS": 0, "FAILED": 0}
+    total = 0
+    for status, count in conn.execute("SELECT status, COUNT(1) FROM reference_items GROUP BY status"):
+        total += count
+        if status in data:
+            data[status] = int(count)
+    data["TOTAL"] = total
     return data
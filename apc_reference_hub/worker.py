@@ -1,37 +1,62 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import os
+import sqlite3
 from collections import defaultdict
+from collections.abc import Callable
+from contextlib import aclosing
 from pathlib import Path
+from typing import Any
 
-from capture import CaptureConfig, capture_urls
+from capture import CaptureConfig, iter_capture_results, open_browser
 from storage import (
-    apply_capture_result,
+    apply_capture_results,
+    claim_pending,
     db_conn,
     init_db,
-    list_pending,
-    mark_processing,
 )
 
+# Results are written in small batches while the rest of the group is still loading.
+RESULT_FLUSH_SIZE = 16
 
-def run_worker(db_path: Path, output_root: Path, limit: int, width: int, height: int, timeout_ms: int, retries: int) -> tuple[int, int]:
-    conn = db_conn(db_path)
-    init_db(conn)
-    pending = list_pending(conn, limit=limit)
-    if not pending:
-        return 0, 0
 
-    grouped = defaultdict(list)
-    for row in pending:
-        grouped[(row["brand"], row["season"], row["item"])].append(row)
+def _failed_result(error: Exception) -> dict:
+    return {"status": "FAILED", "error_message": str(error), "image_path": "", "captured_at": ""}
 
-    ids = [r["id"] for r in pending]
-    mark_processing(conn, ids)
 
+async def capture_groups(
+    conn: sqlite3.Connection,
+    groups: list[tuple[tuple[str, str, str], list[dict]]],
+    output_root: Path,
+    width: int,
+    height: int,
+    timeout_ms: int,
+    retries: int,
+    max_parallel_groups: int = 1,
+    on_progress: Callable[[int], None] | None = None,
+) -> tuple[int, int]:
     ok_count = 0
     fail_count = 0
-    for (brand, season, item), rows in grouped.items():
+    recorded: set[str] = set()
+
+    def record(pairs: list[tuple[str, dict]]) -> None:
+        nonlocal ok_count, fail_count
+        if not pairs:
+            return
+        apply_capture_results(conn, pairs)
+        for row_id, result in pairs:
+            recorded.add(row_id)
+            if result.get("status") == "SUCCESS":
+                ok_count += 1
+            else:
+                fail_count += 1
+        if on_progress is not None:
+            on_progress(len(recorded))
+
+    async def run_group(browser: Any, sem: asyncio.Semaphore, key: tuple[str, str, str], rows: list[dict]) -> None:
+        brand, season, item = key
         cfg = CaptureConfig(
             output_root=output_root,
             brand=brand,
@@ -43,26 +68,55 @@ def run_worker(db_path: Path, output_root: Path, limit: int, width: int, height:
             max_retries=retries,
         )
         urls = [r["source_url"] for r in rows]
-        try:
-            results = capture_urls(urls, cfg, start_index=1)
-            for source_row, result in zip(rows, results):
-                apply_capture_result(conn, source_row["id"], result)
-                if result.get("status") == "SUCCESS":
-                    ok_count += 1
-                else:
-                    fail_count += 1
-        except Exception as e:  # noqa: BLE001
-            for source_row in rows:
-                apply_capture_result(
-                    conn,
-                    source_row["id"],
-                    {"status": "FAILED", "error_message": str(e), "image_path": "", "captured_at": ""},
-                )
-                fail_count += 1
+        done: set[int] = set()
+        pairs: list[tuple[str, dict]] = []
+        async with sem:
+            try:
+                # aclosing() tears down the group's pages/context even if a DB write below raises.
+                async with aclosing(iter_capture_results(urls, cfg, start_index=1, browser=browser)) as results:
+                    async for pos, result in results:
+                        done.add(pos)
+                        pairs.append((rows[pos]["id"], result))
+                        if len(pairs) >= RESULT_FLUSH_SIZE:
+                            record(pairs)
+                            pairs = []
+            except Exception as e:  # noqa: BLE001
+                pairs.extend((row["id"], _failed_result(e)) for pos, row in enumerate(rows) if pos not in done)
+        record(pairs)
+
+    error: Exception | None = None
+    try:
+        # Chromium is launched once for the whole run; each group only gets its own context.
+        async with open_browser() as browser:
+            sem = asyncio.Semaphore(max(1, max_parallel_groups))
+            # return_exceptions: one group's DB failure must not cancel the others mid-capture.
+            outcomes = await asyncio.gather(
+                *(run_group(browser, sem, key, rows) for key, rows in groups), return_exceptions=True
+            )
+        error = next((o for o in outcomes if isinstance(o, Exception)), None)
+    except Exception as e:  # noqa: BLE001
+        error = e
+    if error is not None:
+        # Browser launch/teardown or a DB write failed: don't leave unrecorded rows stuck in PROCESSING.
+        record([(row["id"], _failed_result(error)) for _, rows in groups for row in rows if row["id"] not in recorded])
 
     return ok_count, fail_count
 
 
+def run_worker(db_path: Path, output_root: Path, limit: int, width: int, height: int, timeout_ms: int, retries: int) -> tuple[int, int]:
+    conn = db_conn(db_path)
+    init_db(conn)
+    pending = claim_pending(conn, limit=limit)
+    if not pending:
+        return 0, 0
+
+    grouped = defaultdict(list)
+    for row in pending:
+        grouped[(row["brand"], row["season"], row["item"])].append(row)
+
+    return asyncio.run(capture_groups(conn, list(grouped.items()), output_root, width, height, timeout_ms, retries))
+
+
 def main() -> None:
     app_dir = Path(__file__).resolve().parent
     data_root = Path(os.environ.get("APC_HUB_DATA_DIR", str(app_dir))).expanduser().resolve()